@@ -1,3 +1,6 @@
+import importlib
+import sys
+
 from cumulusci.tasks.metadata_etl.base import (
     BaseMetadataETLTask,
     BaseMetadataSynthesisTask,
@@ -6,20 +9,39 @@ from cumulusci.tasks.metadata_etl.base import (
     get_new_tag_index,
     MD,
 )
-from cumulusci.tasks.metadata_etl.layouts import AddRelatedLists
-from cumulusci.tasks.metadata_etl.permissions import AddPermissionSetPermissions
-from cumulusci.tasks.metadata_etl.value_sets import AddValueSetEntries
-from cumulusci.tasks.metadata_etl.sharing import SetOrgWideDefaults
 
-flake8 = (
-    BaseMetadataETLTask,
-    BaseMetadataSynthesisTask,
-    BaseMetadataTransformTask,
-    MetadataSingleEntityTransformTask,
-    AddRelatedLists,
-    AddPermissionSetPermissions,
-    AddValueSetEntries,
-    SetOrgWideDefaults,
-    get_new_tag_index,
-    MD,
-)
+# Concrete tasks are imported on first access, so that loading this package
+# (e.g. to subclass the base tasks) does not import every task module.
+_LAZY = {
+    "AddRelatedLists": "cumulusci.tasks.metadata_etl.layouts",
+    "AddPermissionSetPermissions": "cumulusci.tasks.metadata_etl.permissions",
+    "AddValueSetEntries": "cumulusci.tasks.metadata_etl.value_sets",
+    "SetOrgWideDefaults": "cumulusci.tasks.metadata_etl.sharing",
+}
+
+__all__ = [
+    "BaseMetadataETLTask",
+    "BaseMetadataSynthesisTask",
+    "BaseMetadataTransformTask",
+    "MetadataSingleEntityTransformTask",
+    "AddRelatedLists",
+    "AddPermissionSetPermissions",
+    "AddValueSetEntries",
+    "SetOrgWideDefaults",
+    "get_new_tag_index",
+    "MD",
+]
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if sys.version_info < (3, 7):  # pragma: no cover
+    # Module-level __getattr__ (PEP 562) requires Python 3.7.
+    for _name in _LAZY:
+        __getattr__(_name)
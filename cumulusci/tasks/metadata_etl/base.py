@@ -1,10 +1,21 @@
 from abc import ABCMeta, abstractmethod
+import concurrent.futures
 import enum
+import functools
+import io
+from itertools import islice
+import os
 from pathlib import Path
+import shutil
+import string
+import subprocess
+import sys
 import tempfile
+import threading
 from urllib.parse import quote, unquote
 
 from lxml import etree
+from lxml.builder import ElementMaker
 
 from cumulusci.core.exceptions import CumulusCIException
 from cumulusci.tasks.salesforce import BaseSalesforceApiTask, Deploy
@@ -15,6 +26,7 @@ from cumulusci.utils import inject_namespace
 from cumulusci.core.config import TaskConfig
 
 MD = "{http://soap.sforce.com/2006/04/metadata}"
+E = ElementMaker(namespace=MD.strip("{}"), nsmap={None: MD.strip("{}")})
 
 
 class MetadataOperation(enum.Enum):
@@ -22,6 +34,27 @@ class MetadataOperation(enum.Enum):
     RETRIEVE = "retrieve"
 
 
+class BackgroundCleanupTemporaryDirectory(tempfile.TemporaryDirectory):
+    """A TemporaryDirectory that is removed by a detached `rm -rf` process,
+    so that deleting many small files does not block the caller. POSIX only."""
+
+    def cleanup(self):
+        if self._finalizer.detach():
+            try:
+                # The shell starts rm in the background and exits at once, so we
+                # can reap it here; rm is reparented rather than left unwaited.
+                subprocess.run(
+                    ["sh", "-c", 'rm -rf "$1" &', "sh", self.name],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    start_new_session=True,
+                    check=True,
+                )
+            except (OSError, subprocess.CalledProcessError):
+                shutil.rmtree(self.name, ignore_errors=True)
+
+
 class BaseMetadataETLTask(BaseSalesforceApiTask, metaclass=ABCMeta):
     """Abstract base class for all Metadata ETL tasks. Concrete tasks should
     generally subclass BaseMetadataSynthesisTask, BaseMetadataTransformTask,
@@ -29,6 +62,10 @@ class BaseMetadataETLTask(BaseSalesforceApiTask, metaclass=ABCMeta):
 
     deploy = False
     retrieve = False
+    # Stage retrieved and transformed metadata in memory-backed storage, if available
+    # with at least tmpfs_min_free_bytes free (Docker limits /dev/shm to 64 MB).
+    prefer_tmpfs = True
+    tmpfs_min_free_bytes = 1024 ** 3
 
     task_options = {
         "managed": {
@@ -53,6 +90,10 @@ class BaseMetadataETLTask(BaseSalesforceApiTask, metaclass=ABCMeta):
 
     def _inject_namespace(self, text):
         """Inject the namespace into the given text if running in managed mode."""
+        # Every namespace token contains %%%, so text without it is a no-op.
+        # Tokens are replaced even without a namespace, so we can't skip on that.
+        if "%%%" not in text:
+            return text
         return inject_namespace(
             "", text, self.options.get("namespace_inject"), self.options["managed"]
         )[1]
@@ -95,8 +136,10 @@ class BaseMetadataETLTask(BaseSalesforceApiTask, metaclass=ABCMeta):
         """Deploy metadata from self.deploy_dir"""
         self.logger.info("Loading transformed metadata...")
         target_profile_xml = Path(self.deploy_dir, "package.xml")
-        target_profile_xml.write_text(
-            self._generate_package_xml(MetadataOperation.DEPLOY)
+        # Deploy packages self.deploy_dir from disk, so the manifest must be written
+        # out; encode it once, explicitly, rather than with the locale's encoding.
+        target_profile_xml.write_bytes(
+            self._generate_package_xml(MetadataOperation.DEPLOY).encode("utf-8")
         )
 
         api = Deploy(
@@ -121,8 +164,35 @@ class BaseMetadataETLTask(BaseSalesforceApiTask, metaclass=ABCMeta):
         operations to complete in the target org."""
         pass
 
+    def _get_tempdir_location(self):
+        """Return the directory in which to create the task's working directory,
+        or None to use the platform default."""
+        location = os.environ.get("CUMULUSCI_ETL_TMPDIR")
+        if location:
+            return location
+        if (
+            self.prefer_tmpfs
+            and sys.platform.startswith("linux")
+            and os.path.isdir("/dev/shm")
+            and os.access("/dev/shm", os.W_OK)
+        ):
+            stat = os.statvfs("/dev/shm")
+            if stat.f_bavail * stat.f_frsize >= self.tmpfs_min_free_bytes:
+                return "/dev/shm"
+
+    def _get_temporary_directory(self):
+        """Return a TemporaryDirectory in which to stage metadata. If
+        CUMULUSCI_FAST_TEMPDIR_CLEANUP is set on a POSIX platform, it is
+        removed in the background once the task finishes with it."""
+        location = self._get_tempdir_location()
+        if sys.platform != "win32" and process_bool_arg(
+            os.environ.get("CUMULUSCI_FAST_TEMPDIR_CLEANUP", False)
+        ):
+            return BackgroundCleanupTemporaryDirectory(dir=location)
+        return tempfile.TemporaryDirectory(dir=location)
+
     def _run_task(self):
-        with tempfile.TemporaryDirectory() as tempdir:
+        with self._get_temporary_directory() as tempdir:
             self._create_directories(tempdir)
             if self.retrieve:
                 self._retrieve()
@@ -159,35 +229,56 @@ class BaseMetadataTransformTask(BaseMetadataETLTask, metaclass=ABCMeta):
     retrieve = True
     deploy = True
 
+    def _init_options(self, kwargs):
+        super()._init_options(kwargs)
+
+        self._sorted_api_names_cache = {}
+        self._package_xml_cache = None
+
     @abstractmethod
     def _get_entities(self):
         """Return a dict of Metadata API entities and API names to be transformed."""
         pass
 
+    def _get_sorted_api_names(self, entity, api_names):
+        """Return api_names in sorted order, reusing the previous result for
+        this entity if its API names have not changed."""
+        key = frozenset(api_names)
+        cached = self._sorted_api_names_cache.get(entity)
+        if cached is None or cached[0] != key:
+            cached = self._sorted_api_names_cache[entity] = (key, sorted(key))
+        return cached[1]
+
     def _get_types_package_xml(self):
-        """Generate package.xml content based on the return value of _get_entities()."""
-        base = """    <types>
-{members}
-        <name>{name}</name>
-    </types>
-"""
-        types = ""
+        """Generate package.xml <types> elements based on the return value of _get_entities()."""
+        types = []
         for entity, api_names in self._get_entities().items():
-            members = "\n".join(
-                f"        <members>{api_name}</members>"
-                for api_name in sorted(api_names)
-            )
-            types += base.format(members=members, name=entity)
+            # SubElement avoids ElementMaker's per-call argument handling,
+            # which dominates for entities with many members.
+            elem = E.types()
+            for api_name in self._get_sorted_api_names(entity, api_names):
+                etree.SubElement(elem, f"{MD}members").text = api_name
+            etree.SubElement(elem, f"{MD}name").text = entity
+            types.append(elem)
 
         return types
 
     def _get_package_xml_content(self, operation):
-        return f"""<?xml version="1.0" encoding="UTF-8"?>
-<Package xmlns="http://soap.sforce.com/2006/04/metadata">
-{self._get_types_package_xml()}
-    <version>{self.api_version}</version>
-</Package>
-"""
+        # The retrieve and deploy manifests are the same unless _transform()
+        # changed the entities, so reuse the last manifest built from equal ones.
+        key = {
+            entity: frozenset(api_names)
+            for entity, api_names in self._get_entities().items()
+        }
+        if self._package_xml_cache is None or self._package_xml_cache[0] != key:
+            package = E.Package(
+                *self._get_types_package_xml(), E.version(self.api_version)
+            )
+            content = etree.tostring(
+                package, pretty_print=True, xml_declaration=True, encoding="UTF-8"
+            ).decode("utf-8")
+            self._package_xml_cache = (key, content)
+        return self._package_xml_cache[1]
 
     @abstractmethod
     def _transform(self):
@@ -197,9 +288,36 @@ class BaseMetadataTransformTask(BaseMetadataETLTask, metaclass=ABCMeta):
 class MetadataSingleEntityTransformTask(BaseMetadataTransformTask, metaclass=ABCMeta):
     """Base class for a Metadata ETL task that affects one or more
     instances of a specific metadata entity. Concrete subclasses must set
-    `entity` to the Metadata API entity transformed, and implement _transform_entity()."""
+    `entity` to the Metadata API entity transformed, and implement _transform_entity().
+
+    Subclasses that only need to visit a few tags in large entities may set
+    `interesting_tags` to a set of tag names (without namespace). _transform_entity()
+    then receives an lxml iterparse context yielding only those elements, rather
+    than a fully-parsed tree.
+
+    Transformed metadata with more than `incremental_write_threshold` elements
+    is written to disk incrementally.
+
+    Whitespace-only text nodes are discarded when parsing; subclasses that rely
+    on them should set `remove_blank_text` to False.
+
+    Subclasses that often return metadata unchanged may set `fast_unchanged_copy`
+    to copy the retrieved file, rather than rewrite it, when the transformed XML
+    serializes identically. This requires `remove_blank_text` to be False, and is
+    otherwise disabled with a warning.
+
+    Files are transformed concurrently, so _transform_entity() may be called from
+    several threads at once. Subclasses whose _transform_entity() is not thread-safe
+    (for example, because it keeps per-task state or makes API calls) should set
+    `max_workers` to 1 to transform files serially. The default, None, uses up
+    to 32 threads depending on the number of CPUs."""
 
     entity = None
+    max_workers = None
+    interesting_tags = None
+    incremental_write_threshold = 10_000
+    remove_blank_text = True
+    fast_unchanged_copy = False
 
     task_options = {
         "api_names": {"description": "List of API names of entities to affect"},
@@ -209,13 +327,22 @@ class MetadataSingleEntityTransformTask(BaseMetadataTransformTask, metaclass=ABC
     def _init_options(self, kwargs):
         super()._init_options(kwargs)
 
-        self.api_names = {
+        api_names = (
             self._inject_namespace(arg)
             for arg in process_list_arg(self.options.get("api_names", ["*"]))
-        }
-        self.api_names = {
-            quote(arg, safe=" ") if arg != "*" else arg for arg in self.api_names
-        }
+        )
+        # Map quoted API names, used to locate metadata files,
+        # to the user-facing names they were derived from.
+        self._api_name_display = {_quote_api_name(arg): arg for arg in api_names}
+        self.api_names = set(self._api_name_display)
+
+        if self.fast_unchanged_copy and self.remove_blank_text:
+            # Discarding blank text reformats the file, so it never matches the source.
+            self.logger.warning(
+                "fast_unchanged_copy has no effect when remove_blank_text is set; "
+                "disabling it."
+            )
+            self.fast_unchanged_copy = False
 
     def _get_entities(self):
         return {self.entity: self.api_names}
@@ -224,7 +351,14 @@ class MetadataSingleEntityTransformTask(BaseMetadataTransformTask, metaclass=ABC
     def _transform_entity(self, metadata, api_name):
         """Accept an XML element corresponding to the metadata entity with
         the given api_name. Transform the XML and return the version which
-        should be deployed, or None to suppress deployment of this entity."""
+        should be deployed (as an ElementTree or root Element), or None to
+        suppress deployment of this entity.
+
+        If `interesting_tags` is set, `metadata` is an iterparse context instead.
+        Once iteration is complete, the parsed tree is available as `metadata.root`
+        and may be returned (wrapped in an ElementTree) for deployment. Clearing
+        processed elements bounds memory use but destroys their content, so only
+        clear elements when returning None or a newly built tree."""
         pass
 
     def _transform(self):
@@ -232,25 +366,13 @@ class MetadataSingleEntityTransformTask(BaseMetadataTransformTask, metaclass=ABC
         # if the entity is an XML file, provide a parsed version
         # and write the returned metadata into the deploy directory
 
-        parser = PackageXmlGenerator(
-            None, self.api_version
-        )  # We'll use it for its metadata_map
-        entity_configurations = [
-            entry
-            for entry in parser.metadata_map
-            if any(
-                [
-                    subentry["type"] == self.entity
-                    for subentry in parser.metadata_map[entry]
-                ]
-            )
-        ]
-        if not entity_configurations:
+        try:
+            directory, configuration = _get_entity_configurations()[self.entity]
+        except KeyError:
             raise CumulusCIException(
                 f"Unable to locate configuration for entity {self.entity}"
             )
 
-        configuration = parser.metadata_map[entity_configurations[0]][0]
         if configuration["class"] not in [
             "MetadataFilenameParser",
             "CustomObjectParser",
@@ -260,61 +382,242 @@ class MetadataSingleEntityTransformTask(BaseMetadataTransformTask, metaclass=ABC
             )
 
         extension = configuration["extension"]
-        directory = entity_configurations[0]
         source_metadata_dir = self.retrieve_dir / directory
 
+        # List the retrieved files once, rather than checking for each API name.
+        suffix = f".{extension}"
+        try:
+            with os.scandir(source_metadata_dir) as entries:
+                available_api_names = {
+                    entry.name[: -len(suffix)]
+                    for entry in entries
+                    if entry.name.endswith(suffix)
+                    and entry.is_file(follow_symlinks=False)
+                }
+        except FileNotFoundError:
+            available_api_names = set()
+
         if "*" in self.api_names:
-            # Walk the retrieved directory to get the actual suite
-            # of API names retrieved and rebuild our api_names list.
+            # Use the actual suite of API names retrieved
+            # to rebuild our api_names list.
             self.api_names.remove("*")
-            self.api_names = self.api_names.union(
-                metadata_file.stem
-                for metadata_file in source_metadata_dir.iterdir()
-                if metadata_file.suffix == f".{extension}"
-            )
+            self.api_names |= available_api_names
 
-        removed_api_names = set()
+        missing_api_names = self.api_names - available_api_names
+        if missing_api_names:
+            missing = ", ".join(
+                sorted(_unquote_api_name(api_name) for api_name in missing_api_names)
+            )
+            raise CumulusCIException(
+                f"Cannot find metadata files in {source_metadata_dir} for: {missing}"
+            )
 
-        for api_name in self.api_names:
-            # Page Layout names can contain spaces, but parentheses and other
-            # characters like ' and < are quoted.
-            # We quote user-specified API names so we can locate the corresponding
-            # metadata files, but present them un-quoted in messages to the user.
-            unquoted_api_name = unquote(api_name)
+        target_metadata_dir = self.deploy_dir / directory
+        target_metadata_dir.mkdir(exist_ok=True)
 
-            path = source_metadata_dir / f"{api_name}.{extension}"
-            if not path.exists():
-                raise CumulusCIException(f"Cannot find metadata file {path}")
+        transform_api_name = functools.partial(
+            self._transform_api_name,
+            source_metadata_dir,
+            target_metadata_dir,
+            extension,
+        )
+        max_workers = self.max_workers or min(32, os.cpu_count() or 4)
+        if max_workers == 1:
+            results = [transform_api_name(api_name) for api_name in self.api_names]
+        else:
+            # Files are independent of one another, and lxml releases the GIL
+            # while parsing and serializing, so process them concurrently.
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers
+            ) as executor:
+                futures = [
+                    executor.submit(transform_api_name, api_name)
+                    for api_name in self.api_names
+                ]
+                try:
+                    results = [
+                        future.result()
+                        for future in concurrent.futures.as_completed(futures)
+                    ]
+                except BaseException:
+                    # Don't wait for the remaining files before reporting the error.
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+        removed_api_names = {api_name for api_name, kept in results if not kept}
+        self.api_names = self.api_names - removed_api_names
 
-            try:
-                tree = etree.parse(str(path))
-            except etree.ParseError as err:
-                err.filename = path
-                raise err
-            transformed_xml = self._transform_entity(tree, unquoted_api_name)
-            if transformed_xml:
-                parent_dir = self.deploy_dir / directory
-                if not parent_dir.exists():
-                    parent_dir.mkdir()
-                destination_path = parent_dir / f"{api_name}.{extension}"
-
-                with destination_path.open(mode="wb") as f:
-                    transformed_xml.write(f, encoding="utf-8", xml_declaration=True)
+    def _transform_api_name(
+        self, source_metadata_dir, target_metadata_dir, extension, api_name
+    ):
+        """Transform the metadata file for a single api_name into the deploy
+        directory. Return a tuple of the api_name and whether it is to be deployed."""
+        # Page Layout names can contain spaces, but parentheses and other
+        # characters like ' and < are quoted.
+        # We quote user-specified API names so we can locate the corresponding
+        # metadata files, but present them un-quoted in messages to the user.
+        unquoted_api_name = self._api_name_display.get(api_name)
+        if unquoted_api_name is None:
+            unquoted_api_name = _unquote_api_name(api_name)
+
+        path = source_metadata_dir / f"{api_name}.{extension}"
+        try:
+            source = path.open(mode="rb")
+        except FileNotFoundError:
+            raise CumulusCIException(f"Cannot find metadata file {path}") from None
+
+        source_bytes = None
+        with source:
+            if self.interesting_tags:
+                tree = etree.iterparse(
+                    source,
+                    events=("end",),
+                    tag=[f"{MD}{tag}" for tag in self.interesting_tags],
+                    remove_blank_text=self.remove_blank_text,
+                    **_XML_PARSER_OPTIONS,
+                )
+                try:
+                    transformed_xml = self._transform_entity(tree, unquoted_api_name)
+                except etree.ParseError as err:
+                    # iterparse only parses as the subclass iterates.
+                    err.filename = path
+                    raise err
             else:
-                # Make sure to remove from our package.xml
-                removed_api_names.add(api_name)
+                if self.fast_unchanged_copy:
+                    source_bytes = source.read()
+                    source = io.BytesIO(source_bytes)
+                try:
+                    tree = etree.parse(
+                        source, parser=_get_xml_parser(self.remove_blank_text)
+                    )
+                except etree.ParseError as err:
+                    err.filename = path
+                    raise err
+                transformed_xml = self._transform_entity(tree, unquoted_api_name)
+
+        if transformed_xml is None:
+            # Make sure to remove from our package.xml
+            return api_name, False
+
+        destination_path = target_metadata_dir / f"{api_name}.{extension}"
+        if source_bytes is not None:
+            self._write_xml_or_copy(
+                transformed_xml, destination_path, path, source_bytes
+            )
+        else:
+            self._write_xml(transformed_xml, destination_path)
+
+        return api_name, True
+
+    def _write_xml(self, xml, path):
+        """Serialize an lxml ElementTree or Element to the given path. Large trees
+        are streamed to disk rather than serialized into memory first."""
+        if isinstance(xml, etree._ElementTree):
+            root = xml.getroot()
+        else:
+            root = xml
+            xml = etree.ElementTree(root)
+
+        # Only stream documents without top-level comments or processing
+        # instructions, which xmlfile would not write, and stop counting
+        # elements once the threshold is passed.
+        if (
+            root.getprevious() is None
+            and root.getnext() is None
+            and next(islice(root.iter(), self.incremental_write_threshold, None), None)
+            is not None
+        ):
+            with etree.xmlfile(str(path), encoding="utf-8") as xf:
+                xf.write_declaration()
+                xf.write(root)
+        else:
+            with path.open(mode="wb") as f:
+                xml.write(f, encoding="utf-8", xml_declaration=True)
+
+    def _write_xml_or_copy(self, xml, path, source_path, source_bytes):
+        """Serialize xml to the given path, unless it is identical to the
+        source file, in which case the source file is copied instead."""
+        serialized = etree.tostring(xml, encoding="utf-8")
+        if serialized == _strip_xml_declaration(source_bytes):
+            shutil.copyfile(source_path, path)
+        else:
+            with path.open(mode="wb") as f:
+                f.write(b"<?xml version='1.0' encoding='UTF-8'?>\n")
+                f.write(serialized)
+
+
+def _strip_xml_declaration(data):
+    """Return XML document bytes without the XML declaration or surrounding whitespace."""
+    if data.startswith(b"<?xml"):
+        data = data[data.index(b"?>") + 2 :]
+    return data.strip()
+
+
+_XML_PARSER_OPTIONS = {
+    "huge_tree": True,
+    "collect_ids": False,
+    "resolve_entities": False,
+}
+_thread_local = threading.local()
+
+
+def _get_xml_parser(remove_blank_text):
+    """Return a reusable XMLParser for the current thread.
+    lxml parsers must not be shared between threads."""
+    parsers = getattr(_thread_local, "parsers", None)
+    if parsers is None:
+        parsers = _thread_local.parsers = {}
+    if remove_blank_text not in parsers:
+        parsers[remove_blank_text] = etree.XMLParser(
+            remove_blank_text=remove_blank_text, **_XML_PARSER_OPTIONS
+        )
+    return parsers[remove_blank_text]
 
-        self.api_names = self.api_names - removed_api_names
+
+# Characters that quote() leaves unchanged for API names.
+_UNQUOTED_CHARS = frozenset(string.ascii_letters + string.digits + "_.- ")
+
+
+def _quote_api_name(api_name):
+    """Percent-encode an API name to match its metadata file name."""
+    if api_name == "*" or _UNQUOTED_CHARS.issuperset(api_name):
+        return api_name
+    return quote(api_name, safe=" ")
+
+
+def _unquote_api_name(api_name):
+    """Decode a percent-encoded metadata file name to its API name."""
+    if "%" not in api_name:
+        return api_name
+    return unquote(api_name)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_entity_configurations():
+    """Return a dict mapping each Metadata API entity type to a tuple of its
+    metadata directory and its configuration from the metadata map."""
+    # We'll use the generator only for its metadata_map
+    metadata_map = PackageXmlGenerator(None, None).metadata_map
+    return {
+        subentry["type"]: (directory, subentry)
+        for directory, subentries in metadata_map.items()
+        for subentry in subentries
+    }
 
 
 def get_new_tag_index(tree, tag, namespace=MD):
     """Return the appropriate insertion index for a new tag of type `tag`,
     positioning it below all existing tags of this type."""
-    # All top-level tags must be grouped together in XML file
-    tags = tree.findall(f".//{namespace}{tag}")
-    if tags:
-        # Insert new tag after the last existing tag of the same type
-        return list(tree.getroot()).index(tags[-1]) + 1
-    else:
-        # There are no existing tags of this type; insert new tag at the bottom.
-        return len(tree.getroot())
+    # All top-level tags must be grouped together in XML file,
+    # as direct children of the root element, so search backwards
+    # from the bottom for the last existing tag of this type.
+    root = tree.getroot()
+    target = f"{namespace}{tag}"
+    for index in range(len(root) - 1, -1, -1):
+        if root[index].tag == target:
+            # Insert new tag after the last existing tag of the same type
+            return index + 1
+
+    # There are no existing tags of this type; insert new tag at the bottom.
+    return len(root)
@@ -1,6 +1,12 @@
 from pathlib import Path
 from unittest import mock
+import shutil
+import subprocess
+import sys
 import tempfile
+import threading
+import time
+import warnings
 
 from lxml import etree
 import pytest
@@ -13,6 +19,11 @@ from cumulusci.tasks.metadata_etl import (
     BaseMetadataTransformTask,
     MetadataSingleEntityTransformTask,
     get_new_tag_index,
+    MD,
+)
+from cumulusci.tasks.metadata_etl.base import (
+    BackgroundCleanupTemporaryDirectory,
+    MetadataOperation,
 )
 
 
@@ -38,6 +49,19 @@ class TestBaseMetadataETLTask:
         task.options["managed"] = False
         assert task._inject_namespace("%%%NAMESPACE%%%Test__c") == "Test__c"
 
+    @mock.patch("cumulusci.tasks.metadata_etl.base.inject_namespace")
+    def test_inject_namespace__no_tokens(self, inject_mock):
+        task = create_task(MetadataETLTask, {"managed": False, "api_version": "47.0"})
+
+        assert task._inject_namespace("Test__c") == "Test__c"
+        inject_mock.assert_not_called()
+
+    def test_inject_namespace__no_namespace(self):
+        task = create_task(MetadataETLTask, {"managed": False, "api_version": "47.0"})
+
+        assert task._inject_namespace("%%%NAMESPACE%%%Test__c") == "Test__c"
+        assert task._inject_namespace("%%%NAMESPACE_OR_C%%%:test") == "c:test"
+
     @mock.patch("cumulusci.tasks.metadata_etl.base.ApiRetrieveUnpackaged")
     def test_retrieve(self, api_mock):
         task = create_task(
@@ -66,9 +90,12 @@ class TestBaseMetadataETLTask:
             )
             task.deploy_dir = Path(tmpdir)
             task._generate_package_xml = mock.Mock()
-            task._generate_package_xml.return_value = "test"
+            task._generate_package_xml.return_value = "test\u00e9"
             result = task._deploy()
-            assert (Path(tmpdir) / "package.xml").read_text() == "test"
+            assert (Path(tmpdir) / "package.xml").read_bytes() == "test\u00e9".encode(
+                "utf-8"
+            )
+            task._generate_package_xml.assert_called_once_with(MetadataOperation.DEPLOY)
 
             assert len(deploy_mock.call_args_list) == 1
 
@@ -93,6 +120,92 @@ class TestBaseMetadataETLTask:
         task._retrieve.assert_called_once_with()
         task._deploy.assert_called_once_with()
 
+    @mock.patch.dict("os.environ", {"CUMULUSCI_ETL_TMPDIR": "/tmp/etl"})
+    def test_get_tempdir_location__env(self):
+        task = create_task(MetadataETLTask, {"api_version": "47.0"})
+
+        assert task._get_tempdir_location() == "/tmp/etl"
+
+    @mock.patch.dict("os.environ", {}, clear=True)
+    @mock.patch("os.access", mock.Mock(return_value=True))
+    @mock.patch("os.path.isdir", mock.Mock(return_value=True))
+    @mock.patch("sys.platform", "linux")
+    @mock.patch("os.statvfs")
+    def test_get_tempdir_location__tmpfs(self, statvfs_mock):
+        statvfs_mock.return_value = mock.Mock(f_bavail=2 * 1024 ** 2, f_frsize=4096)
+        task = create_task(MetadataETLTask, {"api_version": "47.0"})
+
+        assert task._get_tempdir_location() == "/dev/shm"
+        statvfs_mock.assert_called_once_with("/dev/shm")
+        task.prefer_tmpfs = False
+        assert task._get_tempdir_location() is None
+
+    @mock.patch.dict("os.environ", {}, clear=True)
+    @mock.patch("os.access", mock.Mock(return_value=True))
+    @mock.patch("os.path.isdir", mock.Mock(return_value=True))
+    @mock.patch("sys.platform", "linux")
+    @mock.patch("os.statvfs")
+    def test_get_tempdir_location__tmpfs_too_small(self, statvfs_mock):
+        # Docker's default 64 MB /dev/shm
+        statvfs_mock.return_value = mock.Mock(f_bavail=16384, f_frsize=4096)
+        task = create_task(MetadataETLTask, {"api_version": "47.0"})
+
+        assert task._get_tempdir_location() is None
+
+    @mock.patch.dict("os.environ", {}, clear=True)
+    @mock.patch("sys.platform", "darwin")
+    def test_get_tempdir_location__default(self):
+        task = create_task(MetadataETLTask, {"api_version": "47.0"})
+
+        assert task._get_tempdir_location() is None
+
+    @mock.patch.dict("os.environ", {"CUMULUSCI_FAST_TEMPDIR_CLEANUP": "True"})
+    @mock.patch("sys.platform", "linux")
+    @mock.patch("subprocess.run")
+    def test_get_temporary_directory__background_cleanup(self, run_mock):
+        task = create_task(MetadataETLTask, {"api_version": "47.0"})
+
+        tempdir = task._get_temporary_directory()
+        assert isinstance(tempdir, BackgroundCleanupTemporaryDirectory)
+        with tempdir as name:
+            pass
+
+        assert run_mock.call_args_list[0][0][0][-1] == name
+        shutil.rmtree(name)
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="POSIX only")
+    def test_background_cleanup__reaps_process(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            with BackgroundCleanupTemporaryDirectory() as name:
+                Path(name, "file.txt").write_text("test")
+
+        assert not [w for w in caught if issubclass(w.category, ResourceWarning)]
+        # rm runs in the background; wait for it without time.sleep, which
+        # other tests may leave patched.
+        waiter = threading.Event()
+        for _ in range(100):
+            if not Path(name).exists():
+                break
+            waiter.wait(0.05)
+        assert not Path(name).exists()
+
+    @mock.patch("subprocess.run", mock.Mock(side_effect=OSError))
+    def test_background_cleanup__fallback(self):
+        with BackgroundCleanupTemporaryDirectory() as name:
+            pass
+
+        assert not Path(name).exists()
+
+    @mock.patch.dict("os.environ", {"CUMULUSCI_FAST_TEMPDIR_CLEANUP": "True"})
+    @mock.patch("sys.platform", "win32")
+    def test_get_temporary_directory__windows(self):
+        task = create_task(MetadataETLTask, {"api_version": "47.0"})
+
+        tempdir = task._get_temporary_directory()
+        assert not isinstance(tempdir, BackgroundCleanupTemporaryDirectory)
+        tempdir.cleanup()
+
 
 class MetadataSynthesisTask(BaseMetadataSynthesisTask):
     _get_package_xml_content = mock.Mock()
@@ -149,23 +262,74 @@ class TestBaseMetadataTransformTask:
 
         assert (
             task._generate_package_xml(False)
-            == """<?xml version="1.0" encoding="UTF-8"?>
+            == """<?xml version='1.0' encoding='UTF-8'?>
 <Package xmlns="http://soap.sforce.com/2006/04/metadata">
-    <types>
-        <members>Account</members>
-        <members>Contact</members>
-        <name>CustomObject</name>
-    </types>
-    <types>
-        <members>Test</members>
-        <name>ApexClass</name>
-    </types>
-
-    <version>47.0</version>
+  <types>
+    <members>Account</members>
+    <members>Contact</members>
+    <name>CustomObject</name>
+  </types>
+  <types>
+    <members>Test</members>
+    <name>ApexClass</name>
+  </types>
+  <version>47.0</version>
 </Package>
 """
         )
 
+    def test_get_package_xml_content__cached(self):
+        task = create_task(
+            MetadataTransformTask,
+            {"managed": False, "namespace_inject": "test", "api_version": "47.0"},
+        )
+        entities = {"CustomObject": {"Account", "Contact"}}
+        task._get_entities = mock.Mock(return_value=entities)
+
+        retrieve_xml = task._get_package_xml_content(MetadataOperation.RETRIEVE)
+        assert "<members>Contact</members>" in retrieve_xml
+        assert task._get_package_xml_content(MetadataOperation.DEPLOY) is retrieve_xml
+
+        entities["CustomObject"].remove("Contact")
+        deploy_xml = task._get_package_xml_content(MetadataOperation.DEPLOY)
+        assert "<members>Account</members>" in deploy_xml
+        assert "<members>Contact</members>" not in deploy_xml
+
+    def test_get_sorted_api_names(self):
+        task = create_task(
+            MetadataTransformTask,
+            {"managed": False, "namespace_inject": "test", "api_version": "47.0"},
+        )
+        api_names = {"Contact", "Account"}
+
+        sorted_names = task._get_sorted_api_names("CustomObject", api_names)
+        assert sorted_names == ["Account", "Contact"]
+        assert (
+            task._get_sorted_api_names("CustomObject", set(api_names)) is sorted_names
+        )
+
+        api_names.add("Lead")
+        new_sorted_names = task._get_sorted_api_names("CustomObject", api_names)
+        assert new_sorted_names == ["Account", "Contact", "Lead"]
+        assert new_sorted_names is not sorted_names
+        assert sorted_names == ["Account", "Contact"]
+
+    def test_generate_package_xml__namespace_and_escaping(self):
+        task = create_task(
+            MetadataTransformTask,
+            {"managed": True, "namespace_inject": "test", "api_version": "47.0"},
+        )
+
+        task._get_entities = mock.Mock()
+        task._get_entities.return_value = {
+            "Layout": {"%%%NAMESPACE%%%Obj__c-Layout", "Account-A & B Layout"}
+        }
+
+        result = task._generate_package_xml(False)
+        assert "<members>test__Obj__c-Layout</members>" in result
+        assert "<members>Account-A &amp; B Layout</members>" in result
+        assert etree.fromstring(result.encode("utf-8")).tag == f"{MD}Package"
+
 
 class ConcreteMetadataSingleEntityTransformTask(MetadataSingleEntityTransformTask):
     def _transform_entity(self, xml_tree, api_name):
@@ -185,6 +349,24 @@ class TestMetadataSingleEntityTransformTask:
         )
         assert task.api_names == set(["test__bar", "foo"])
 
+    def test_init_options__quoted(self):
+        task = create_task(
+            ConcreteMetadataSingleEntityTransformTask,
+            {
+                "managed": False,
+                "api_version": "47.0",
+                "api_names": "Contact (Marketing) Layout,Account-Account Layout",
+            },
+        )
+
+        assert task.api_names == set(
+            ["Contact %28Marketing%29 Layout", "Account-Account Layout"]
+        )
+        assert task._api_name_display == {
+            "Contact %28Marketing%29 Layout": "Contact (Marketing) Layout",
+            "Account-Account Layout": "Account-Account Layout",
+        }
+
     def test_get_entities(self):
         task = create_task(
             ConcreteMetadataSingleEntityTransformTask,
@@ -207,7 +389,7 @@ class TestMetadataSingleEntityTransformTask:
         )
 
         task.entity = "CustomApplication"
-        task._transform_entity = mock.Mock()
+        task._transform_entity = mock.Mock(side_effect=lambda xml, api_name: xml)
 
         input_xml = """<?xml version="1.0" encoding="UTF-8"?>
 <CustomApplication xmlns="http://soap.sforce.com/2006/04/metadata">
@@ -226,6 +408,396 @@ class TestMetadataSingleEntityTransformTask:
 
             assert len(task._transform_entity.call_args_list) == 1
 
+    def test_transform__interesting_tags(self):
+        task = create_task(
+            ConcreteMetadataSingleEntityTransformTask,
+            {"managed": False, "api_version": "47.0", "api_names": "Test"},
+        )
+
+        task.entity = "CustomApplication"
+        task.interesting_tags = {"tabs"}
+
+        def transform_entity(context, api_name):
+            for _, elem in context:
+                elem.text = elem.text.replace("standard-", "custom-")
+            return etree.ElementTree(context.root)
+
+        task._transform_entity = transform_entity
+
+        input_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<CustomApplication xmlns="http://soap.sforce.com/2006/04/metadata">
+    <label>Application</label>
+    <tabs>standard-Account</tabs>
+    <tabs>standard-Contact</tabs>
+</CustomApplication>"""
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            task._create_directories(tmpdir)
+
+            test_path = task.retrieve_dir / "applications"
+            test_path.mkdir()
+            test_path = test_path / "Test.app"
+
+            test_path.write_text(input_xml)
+
+            task._transform()
+
+            output = etree.parse(str(task.deploy_dir / "applications" / "Test.app"))
+            assert [elem.text for elem in output.getroot()] == [
+                "Application",
+                "custom-Account",
+                "custom-Contact",
+            ]
+
+    def test_transform__interesting_tags__clear(self):
+        task = create_task(
+            ConcreteMetadataSingleEntityTransformTask,
+            {"managed": False, "api_version": "47.0", "api_names": "Test"},
+        )
+
+        task.entity = "CustomApplication"
+        task.interesting_tags = {"tabs"}
+        tabs = []
+
+        def transform_entity(context, api_name):
+            for _, elem in context:
+                tabs.append(elem.text)
+                elem.clear(keep_tail=True)
+            return None
+
+        task._transform_entity = transform_entity
+
+        input_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<CustomApplication xmlns="http://soap.sforce.com/2006/04/metadata">
+    <tabs>standard-Account</tabs>
+    <tabs>standard-Contact</tabs>
+</CustomApplication>"""
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            task._create_directories(tmpdir)
+
+            test_path = task.retrieve_dir / "applications"
+            test_path.mkdir()
+            (test_path / "Test.app").write_text(input_xml)
+
+            task._transform()
+
+            assert tabs == ["standard-Account", "standard-Contact"]
+            assert task.api_names == set()
+            assert not (task.deploy_dir / "applications" / "Test.app").exists()
+
+    def test_transform__interesting_tags__xml_parse_error(self):
+        task = create_task(
+            ConcreteMetadataSingleEntityTransformTask,
+            {"managed": False, "api_version": "47.0", "api_names": "Test"},
+        )
+
+        task.entity = "CustomApplication"
+        task.interesting_tags = {"tabs"}
+        task._transform_entity = lambda context, api_name: list(context)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            task._create_directories(tmpdir)
+
+            test_path = task.retrieve_dir / "applications"
+            test_path.mkdir()
+            test_path = test_path / "Test.app"
+
+            test_path.write_text(">>>>>NOT XML<<<<<")
+            with pytest.raises(etree.ParseError) as e:
+                task._transform()
+
+            assert e.value.filename == test_path
+
+    def test_transform__many_files(self):
+        task = create_task(
+            ConcreteMetadataSingleEntityTransformTask,
+            {"managed": False, "api_version": "47.0", "api_names": "*"},
+        )
+
+        task.entity = "CustomApplication"
+        task._transform_entity = mock.Mock(
+            side_effect=lambda xml, api_name: None if api_name.endswith("0") else xml
+        )
+
+        input_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<CustomApplication xmlns="http://soap.sforce.com/2006/04/metadata">
+</CustomApplication>"""
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            task._create_directories(tmpdir)
+
+            app_path = task.retrieve_dir / "applications"
+            app_path.mkdir()
+            for i in range(50):
+                (app_path / f"Test_{i}.app").write_text(input_xml)
+
+            task._transform()
+
+            assert len(task._transform_entity.call_args_list) == 50
+            assert task.api_names == {f"Test_{i}" for i in range(50) if i % 10}
+            assert len(list((task.deploy_dir / "applications").iterdir())) == 45
+
+    @mock.patch("concurrent.futures.ThreadPoolExecutor")
+    def test_transform__serial(self, executor_mock):
+        task = create_task(
+            ConcreteMetadataSingleEntityTransformTask,
+            {"managed": False, "api_version": "47.0", "api_names": "*"},
+        )
+
+        task.entity = "CustomApplication"
+        task.max_workers = 1
+        threads = set()
+
+        def transform_entity(xml, api_name):
+            threads.add(threading.get_ident())
+            return xml
+
+        task._transform_entity = transform_entity
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            task._create_directories(tmpdir)
+
+            app_path = task.retrieve_dir / "applications"
+            app_path.mkdir()
+            for i in range(5):
+                (app_path / f"Test_{i}.app").write_text("<CustomApplication/>")
+
+            task._transform()
+
+            executor_mock.assert_not_called()
+            assert threads == {threading.get_ident()}
+            assert len(task.api_names) == 5
+
+    def test_transform__cancel_on_error(self):
+        task = create_task(
+            ConcreteMetadataSingleEntityTransformTask,
+            {"managed": False, "api_version": "47.0", "api_names": "*"},
+        )
+
+        task.entity = "CustomApplication"
+        task.max_workers = 2
+
+        def transform_entity(xml, api_name):
+            time.sleep(0.05)
+            raise CumulusCIException(api_name)
+
+        task._transform_entity = mock.Mock(side_effect=transform_entity)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            task._create_directories(tmpdir)
+
+            app_path = task.retrieve_dir / "applications"
+            app_path.mkdir()
+            for i in range(50):
+                (app_path / f"Test_{i}.app").write_text("<CustomApplication/>")
+
+            with pytest.raises(CumulusCIException):
+                task._transform()
+
+            assert len(task._transform_entity.call_args_list) < 50
+
+    def test_transform__incremental_write(self):
+        task = create_task(
+            ConcreteMetadataSingleEntityTransformTask,
+            {"managed": False, "api_version": "47.0", "api_names": "Test,Test_2"},
+        )
+
+        task.entity = "CustomApplication"
+        task.incremental_write_threshold = 3
+        task._transform_entity = mock.Mock(
+            side_effect=lambda xml, api_name: xml.getroot()
+            if api_name == "Test_2"
+            else xml
+        )
+
+        input_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<CustomApplication xmlns="http://soap.sforce.com/2006/04/metadata">
+    <tabs>standard-Account</tabs>
+    <tabs>standard-Contact</tabs>
+    <tabs>standard-Lead</tabs>
+</CustomApplication>"""
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            task._create_directories(tmpdir)
+
+            app_path = task.retrieve_dir / "applications"
+            app_path.mkdir()
+            (app_path / "Test.app").write_text(input_xml)
+            (app_path / "Test_2.app").write_text(input_xml)
+
+            task._transform()
+
+            for name in ["Test.app", "Test_2.app"]:
+                output = (task.deploy_dir / "applications" / name).read_bytes()
+                assert output.startswith(b"<?xml")
+                tree = etree.fromstring(output)
+                assert [elem.text for elem in tree] == [
+                    "standard-Account",
+                    "standard-Contact",
+                    "standard-Lead",
+                ]
+
+    @mock.patch("lxml.etree.xmlfile", wraps=etree.xmlfile)
+    def test_write_xml__incremental_threshold(self, xmlfile_mock):
+        task = create_task(
+            ConcreteMetadataSingleEntityTransformTask,
+            {"managed": False, "api_version": "47.0"},
+        )
+        task.incremental_write_threshold = 3
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir, "Test.app")
+
+            task._write_xml(etree.fromstring("<r><a/><b/></r>"), path)
+            xmlfile_mock.assert_not_called()
+            assert etree.parse(str(path)).getroot().tag == "r"
+
+            task._write_xml(etree.fromstring("<r><a/><b/><c/></r>"), path)
+            xmlfile_mock.assert_called_once()
+            assert len(etree.parse(str(path)).getroot()) == 3
+
+    @mock.patch("lxml.etree.xmlfile", wraps=etree.xmlfile)
+    def test_write_xml__keeps_top_level_comments(self, xmlfile_mock):
+        task = create_task(
+            ConcreteMetadataSingleEntityTransformTask,
+            {"managed": False, "api_version": "47.0"},
+        )
+        task.incremental_write_threshold = 1
+        tree = etree.ElementTree(etree.fromstring("<!-- top --><r><a/></r><?pi x?>"))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir, "Test.app")
+            task._write_xml(tree, path)
+
+            xmlfile_mock.assert_not_called()
+            output = path.read_bytes()
+            assert b"<!-- top -->" in output
+            assert b"<?pi x?>" in output
+
+    def test_transform__remove_blank_text(self):
+        task = create_task(
+            ConcreteMetadataSingleEntityTransformTask,
+            {"managed": False, "api_version": "47.0", "api_names": "Test"},
+        )
+
+        task.entity = "CustomApplication"
+        task._transform_entity = mock.Mock(side_effect=lambda xml, api_name: xml)
+
+        input_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<CustomApplication xmlns="http://soap.sforce.com/2006/04/metadata">
+    <label>Application</label>
+</CustomApplication>"""
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            task._create_directories(tmpdir)
+
+            test_path = task.retrieve_dir / "applications"
+            test_path.mkdir()
+            (test_path / "Test.app").write_text(input_xml)
+
+            task._transform()
+            tree = task._transform_entity.call_args_list[0][0][0]
+            assert tree.getroot().text is None
+
+            task.remove_blank_text = False
+            task._transform()
+            tree = task._transform_entity.call_args_list[1][0][0]
+            assert tree.getroot().text.strip() == ""
+
+    @mock.patch("shutil.copyfile", wraps=shutil.copyfile)
+    def test_transform__fast_unchanged_copy(self, copyfile_mock):
+        task = create_task(
+            ConcreteMetadataSingleEntityTransformTask,
+            {"managed": False, "api_version": "47.0", "api_names": "Test,Test_2"},
+        )
+
+        task.entity = "CustomApplication"
+        task.remove_blank_text = False
+        task.fast_unchanged_copy = True
+
+        def transform_entity(xml, api_name):
+            if api_name == "Test_2":
+                xml.getroot()[0].text = "Changed"
+            return xml
+
+        task._transform_entity = transform_entity
+
+        input_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<CustomApplication xmlns="http://soap.sforce.com/2006/04/metadata">
+    <label>Application</label>
+</CustomApplication>
+"""
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            task._create_directories(tmpdir)
+
+            app_path = task.retrieve_dir / "applications"
+            app_path.mkdir()
+            (app_path / "Test.app").write_text(input_xml)
+            (app_path / "Test_2.app").write_text(input_xml)
+
+            task._transform()
+
+            deploy_path = task.deploy_dir / "applications"
+            copyfile_mock.assert_called_once_with(
+                app_path / "Test.app", deploy_path / "Test.app"
+            )
+            assert (deploy_path / "Test.app").read_text() == input_xml
+            output = (deploy_path / "Test_2.app").read_bytes()
+            assert output.startswith(b"<?xml")
+            assert etree.fromstring(output)[0].text == "Changed"
+
+    def test_init_options__fast_unchanged_copy_needs_blank_text(self):
+        class FastCopyTask(ConcreteMetadataSingleEntityTransformTask):
+            fast_unchanged_copy = True
+
+        task = create_task(FastCopyTask, {"managed": False, "api_version": "47.0"})
+        assert not task.fast_unchanged_copy
+
+        FastCopyTask.remove_blank_text = False
+        task = create_task(FastCopyTask, {"managed": False, "api_version": "47.0"})
+        assert task.fast_unchanged_copy
+
+    @mock.patch("lxml.etree.xmlfile")
+    def test_transform__fast_unchanged_copy_serializes_once(self, xmlfile_mock):
+        task = create_task(
+            ConcreteMetadataSingleEntityTransformTask,
+            {"managed": False, "api_version": "47.0", "api_names": "Test"},
+        )
+
+        task.entity = "CustomApplication"
+        task.remove_blank_text = False
+        task.fast_unchanged_copy = True
+        task.incremental_write_threshold = 1
+
+        def transform_entity(xml, api_name):
+            xml.getroot()[0].text = "Changed"
+            return xml
+
+        task._transform_entity = transform_entity
+
+        input_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<CustomApplication xmlns="http://soap.sforce.com/2006/04/metadata">
+    <label>Application</label>
+</CustomApplication>
+"""
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            task._create_directories(tmpdir)
+
+            app_path = task.retrieve_dir / "applications"
+            app_path.mkdir()
+            (app_path / "Test.app").write_text(input_xml)
+
+            task._transform()
+
+            # The bytes built for the comparison are written as-is.
+            xmlfile_mock.assert_not_called()
+            output = (task.deploy_dir / "applications" / "Test.app").read_bytes()
+            assert output.startswith(b"<?xml")
+            assert etree.fromstring(output)[0].text == "Changed"
+
     def test_transform__bad_entity(self):
         task = create_task(
             ConcreteMetadataSingleEntityTransformTask,
@@ -261,6 +833,9 @@ class TestMetadataSingleEntityTransformTask:
             test_path = app_path / "Test_2.app"
             test_path.write_text(input_xml)
 
+            (app_path / "Test_3.app-meta.xml").write_text(input_xml)
+            (app_path / "Test_4.app").mkdir()
+
             task._transform()
 
             assert task.api_names == set(["Test", "Test_2"])
@@ -332,6 +907,31 @@ class TestMetadataSingleEntityTransformTask:
                 task.deploy_dir / "layouts" / "Contact %28Marketing%29 Layout.layout"
             ).exists()
 
+    def test_transform__shared_directory_entity(self):
+        task = create_task(
+            ConcreteMetadataSingleEntityTransformTask,
+            {"managed": False, "api_version": "47.0", "api_names": "Test"},
+        )
+
+        task.entity = "WaveDashboard"
+        task._transform_entity = mock.Mock(side_effect=lambda xml, api_name: xml)
+
+        input_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<WaveDashboard xmlns="http://soap.sforce.com/2006/04/metadata">
+</WaveDashboard>"""
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            task._create_directories(tmpdir)
+
+            test_path = task.retrieve_dir / "wave"
+            test_path.mkdir()
+            (test_path / "Test.wdash").write_text(input_xml)
+
+            task._transform()
+
+            assert len(task._transform_entity.call_args_list) == 1
+            assert (task.deploy_dir / "wave" / "Test.wdash").exists()
+
     def test_transform__non_xml_entity(self):
         task = create_task(
             ConcreteMetadataSingleEntityTransformTask,
@@ -360,6 +960,32 @@ class TestMetadataSingleEntityTransformTask:
             with pytest.raises(CumulusCIException):
                 task._transform()
 
+    def test_transform__missing_records(self):
+        task = create_task(
+            ConcreteMetadataSingleEntityTransformTask,
+            {
+                "managed": False,
+                "api_version": "47.0",
+                "api_names": "Test,Test (2),Test_3",
+            },
+        )
+
+        task.entity = "CustomApplication"
+        task._transform_entity = mock.Mock()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            task._create_directories(tmpdir)
+
+            test_path = task.retrieve_dir / "applications"
+            test_path.mkdir()
+            (test_path / "Test_3.app").write_text("<CustomApplication/>")
+
+            with pytest.raises(CumulusCIException) as e:
+                task._transform()
+
+            assert "Test, Test (2)" in str(e.value)
+            task._transform_entity.assert_not_called()
+
     def test_transform__xml_parse_error(self):
         task = create_task(
             ConcreteMetadataSingleEntityTransformTask,
@@ -397,3 +1023,48 @@ class TestUtilities:
 
         assert get_new_tag_index(root, "tabs") == 5
         assert get_new_tag_index(root, "relatedList") == 6
+
+    def test_get_new_tag_index__no_namespace(self):
+        root = etree.fromstring(b"<root><a/><b/><a/><c/></root>").getroottree()
+
+        assert get_new_tag_index(root, "a", "") == 3
+        assert get_new_tag_index(root, "d", "") == 4
+
+    def test_get_new_tag_index__comments(self):
+        root = etree.fromstring(
+            b"<root><a/><!-- comment --><b/><!-- comment --></root>"
+        ).getroottree()
+
+        assert get_new_tag_index(root, "a", "") == 1
+        assert get_new_tag_index(root, "b", "") == 3
+
+    def test_get_new_tag_index__ignores_nested_tags(self):
+        root = etree.fromstring(self.XML_SAMPLE).getroottree()
+        etree.SubElement(root.getroot()[0], f"{MD}tabs")
+
+        assert get_new_tag_index(root, "tabs") == 5
+
+
+class TestPackage:
+    def test_import_does_not_load_tasks(self):
+        # Run in a fresh interpreter, since other tests import the task modules.
+        code = (
+            "import sys\n"
+            "import cumulusci.tasks.metadata_etl\n"
+            "for name in ('layouts', 'permissions', 'value_sets', 'sharing'):\n"
+            "    assert 'cumulusci.tasks.metadata_etl.' + name not in sys.modules, name\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+    def test_lazy_task_import(self):
+        from cumulusci.core.utils import import_global
+        import cumulusci.tasks.metadata_etl as metadata_etl
+        from cumulusci.tasks.metadata_etl.layouts import AddRelatedLists
+
+        assert metadata_etl.AddRelatedLists is AddRelatedLists
+        assert (
+            import_global("cumulusci.tasks.metadata_etl.SetOrgWideDefaults").entity
+            == "CustomObject"
+        )
+        with pytest.raises(AttributeError):
+            metadata_etl.Battlestar